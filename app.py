@@ -9,7 +9,7 @@ Robot Sensor Data Visualizer (Unified)
 .bag   → ROS1 bag（observation, tactile, camera, human pose, quality）
 
 依赖:
-  pip install streamlit plotly numpy google-api-python-client google-auth
+  pip install streamlit plotly plotly-resampler numpy orjson google-api-python-client google-auth
   pip install rosbags Pillow
 
 运行:
@@ -17,22 +17,43 @@ Robot Sensor Data Visualizer (Unified)
 """
 
 import streamlit as st
-import json
 import numpy as np
 import plotly.graph_objects as go
+import plotly.io as pio
 from plotly.subplots import make_subplots
+from plotly_resampler import FigureResampler
 import os
 import io
 import time
 import tempfile
 import hashlib
+import threading
 from pathlib import Path
-from collections import defaultdict
+from collections import Counter, defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
+import httplib2
 from google.oauth2 import service_account
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaIoBaseDownload
 
+try:
+    import orjson
+
+    json_loads = orjson.loads
+except ImportError:  # 退回 ujson / 标准库 json，二者同样可以直接解析 bytes
+    orjson = None
+    try:
+        from ujson import loads as json_loads
+    except ImportError:
+        from json import loads as json_loads
+
+# st.plotly_chart 通过 plotly.io 序列化 figure；orjson 引擎直接编码 ndarray，比默认 json 快得多
+if orjson is not None:
+    pio.json.config.default_engine = "orjson"
+
 # ============================================================================
 # 页面配置
 # ============================================================================
@@ -110,21 +131,59 @@ def check_password() -> bool:
 
 MAX_RETRIES = 3
 RETRY_DELAY = 2
+HTTP_TIMEOUT = 30  # socket 超时（秒）
+# MediaIoBaseDownload 每次 Range 请求的字节数。库默认值已是 100 MiB，
+# 调小只会增加往返次数，这里显式写出以免被改成小块。
+DOWNLOAD_CHUNK_SIZE = 100 * 1024 * 1024
+# 小于该大小的文件用一次 get_media().execute() 直接取回全部字节
+SINGLE_SHOT_MAX_SIZE = 50 * 1024 * 1024
+# 本地 JSON 磁盘缓存的总大小上限，超出后按 mtime 从旧到新淘汰（Streamlit Cloud 磁盘有限）
+JSON_CACHE_MAX_BYTES = 1024 * 1024 * 1024
 
 
 @st.cache_resource(ttl=1800)
-def get_gdrive_service():
+def get_gdrive_credentials():
     try:
-        credentials = service_account.Credentials.from_service_account_info(
+        return service_account.Credentials.from_service_account_info(
             st.secrets["gcp_service_account"],
             scopes=["https://www.googleapis.com/auth/drive.readonly"],
         )
-        return build("drive", "v3", credentials=credentials)
     except Exception as e:
         st.error(f"Failed to authenticate with Drive: {e}")
         return None
 
 
+def _new_authorized_http(credentials):
+    """带超时的 AuthorizedHttp；同一个 httplib2.Http 会复用到 googleapis 的 TLS 连接"""
+    return AuthorizedHttp(credentials, http=httplib2.Http(timeout=HTTP_TIMEOUT))
+
+
+@st.cache_resource(ttl=1800)
+def get_gdrive_service():
+    credentials = get_gdrive_credentials()
+    if credentials is None:
+        return None
+    try:
+        return build(
+            "drive", "v3", http=_new_authorized_http(credentials), cache_discovery=False
+        )
+    except Exception as e:
+        st.error(f"Failed to authenticate with Drive: {e}")
+        return None
+
+
+_thread_local = threading.local()
+
+
+def _thread_http(credentials):
+    """当前线程专用的 AuthorizedHttp（httplib2.Http 不是线程安全的，不能跨线程共享）"""
+    http = getattr(_thread_local, "http", None)
+    if http is None:
+        http = _new_authorized_http(credentials)
+        _thread_local.http = http
+    return http
+
+
 def _execute_with_retry(request_fn, description="API call"):
     for attempt in range(1, MAX_RETRIES + 1):
         try:
@@ -145,49 +204,154 @@ def _execute_with_retry(request_fn, description="API call"):
 
 
 SUPPORTED_EXTENSIONS = (".json", ".bag")
+LIST_WORKERS = 16
+BATCH_SIZE = 100  # Drive batch 请求的子请求上限
+PARENTS_PER_QUERY = 50  # 单个 files().list 查询用 or 合并的父文件夹数
 
 
-@st.cache_data(ttl=3600)
-def list_data_files_from_gdrive(_service, folder_id):
-    """递归列出 Google Drive 文件夹中所有 .json 和 .bag 文件"""
-    if _service is None:
-        return []
+def _split_children(items, parent_paths):
+    """
+    把 files().list 的结果拆成 (子文件夹 [(id, path)], 数据文件 [dict])。
+    parent_paths: 本次查询涉及的 {父文件夹 id: path}，按 item 的 parents 还原路径。
+    """
+    folders, files = [], []
+    for item in items:
+        parent_path = next((parent_paths[p] for p in item.get("parents", []) if p in parent_paths), None)
+        if parent_path is None:
+            continue
+        name = item["name"]
+        fid = item["id"]
+        current_path = f"{parent_path}/{name}" if parent_path else name
+
+        if item["mimeType"] == "application/vnd.google-apps.folder":
+            folders.append((fid, current_path))
+        elif any(name.lower().endswith(ext) for ext in SUPPORTED_EXTENSIONS):
+            files.append(
+                {
+                    "id": fid,
+                    "name": name,
+                    "path": current_path,
+                    "size": int(item.get("size", 0)),
+                    "modified": item.get("modifiedTime"),
+                    "type": "bag" if name.lower().endswith(".bag") else "json",
+                }
+            )
+    return folders, files
 
-    data_files = []
 
-    def _recurse(parent_id, parent_path=""):
-        try:
-            query = f"'{parent_id}' in parents and trashed=false"
+def _plan_batches(folders, next_pages=()):
+    """
+    把待查询的文件夹每 PARENTS_PER_QUERY 个合并成一个 or 查询，
+    连同未取完的分页一起，每 BATCH_SIZE 个查询打包成一个 batch。
+    查询的形式为 (((folder_id, path), ...), page_token)
+    """
+    queries = list(next_pages) + [
+        (tuple(folders[i:i + PARENTS_PER_QUERY]), None)
+        for i in range(0, len(folders), PARENTS_PER_QUERY)
+    ]
+    return [queries[i:i + BATCH_SIZE] for i in range(0, len(queries), BATCH_SIZE)]
+
 
-            def do_list():
-                return (
-                    _service.files()
-                    .list(q=query, fields="files(id, name, mimeType, size)", pageSize=1000)
-                    .execute()
+def _is_retryable(exception):
+    """batch 子请求的限流（403 rateLimitExceeded / 429）和 5xx 错误可以重试"""
+    if not isinstance(exception, HttpError):
+        return False
+    status = exception.resp.status
+    if status == 429 or status >= 500:
+        return True
+    return status == 403 and b"ateLimitExceeded" in (exception.content or b"")
+
+
+def _list_batch(service, credentials, queries):
+    """
+    把一组查询合并成一个 batch HTTP 请求执行，可在工作线程中调用。
+    因限流 / 5xx 失败的子请求退避后重新打包成下一个 batch 重试，最多 MAX_RETRIES 轮。
+    返回 (新发现的子文件夹 [(id, path)], 未取完的分页查询, 数据文件 [dict], 错误 [(path, exc)])
+    """
+    folders, next_pages, files, errors = [], [], [], []
+    pending = list(queries)
+
+    for attempt in range(1, MAX_RETRIES + 1):
+        retry = []
+
+        def on_response(request_id, response, exception):
+            parents, page_token = pending[int(request_id)]
+            if exception is not None:
+                if attempt < MAX_RETRIES and _is_retryable(exception):
+                    retry.append((parents, page_token))
+                else:
+                    errors.extend((path or "root", exception) for _, path in parents)
+                return
+            found_folders, found_files = _split_children(response.get("files", []), dict(parents))
+            folders.extend(found_folders)
+            files.extend(found_files)
+            token = response.get("nextPageToken")
+            if token:
+                next_pages.append((parents, token))
+
+        def do_batch():
+            batch = service.new_batch_http_request(callback=on_response)
+            for i, (parents, page_token) in enumerate(pending):
+                in_parents = " or ".join(f"'{fid}' in parents" for fid, _ in parents)
+                batch.add(
+                    service.files().list(
+                        q=f"trashed=false and ({in_parents})",
+                        fields="nextPageToken, files(id, name, mimeType, size, modifiedTime, parents)",
+                        pageSize=1000,
+                        pageToken=page_token,
+                    ),
+                    request_id=str(i),
                 )
+            batch.execute(http=_thread_http(credentials))
 
-            results = _execute_with_retry(do_list, f"list {parent_path or 'root'}")
-            for item in results.get("files", []):
-                name = item["name"]
-                fid = item["id"]
-                current_path = f"{parent_path}/{name}" if parent_path else name
-
-                if item["mimeType"] == "application/vnd.google-apps.folder":
-                    _recurse(fid, current_path)
-                elif any(name.lower().endswith(ext) for ext in SUPPORTED_EXTENSIONS):
-                    data_files.append(
-                        {
-                            "id": fid,
-                            "name": name,
-                            "path": current_path,
-                            "size": int(item.get("size", 0)),
-                            "type": "bag" if name.lower().endswith(".bag") else "json",
-                        }
-                    )
-        except Exception as e:
-            st.warning(f"Error listing {parent_path}: {e}")
+        n_folders = sum(len(parents) for parents, _ in pending)
+        _execute_with_retry(do_batch, f"list batch ({n_folders} folders)")
+        if not retry:
+            break
+        pending = retry
+        time.sleep(RETRY_DELAY * attempt)
+    return folders, next_pages, files, errors
+
+
+@st.cache_data(persist="disk", max_entries=4, show_spinner=False)
+def list_data_files_from_gdrive(folder_id):
+    """
+    递归列出 Google Drive 文件夹中所有 .json 和 .bag 文件。
+    结果持久化到磁盘，进程重启后不必重新遍历；persist 模式下不支持 ttl，
+    数据集更新后通过侧边栏的 "Refresh file list" 手动刷新。
+    兄弟文件夹用 or 合并成一个查询、多个查询再合并成 batch 请求，在线程池中并发执行；
+    任一 batch 返回后立即提交其子文件夹，不等同层其他 batch（慢请求不拖住整层）。
+    有文件夹列出失败时抛 RuntimeError，不完整的列表不进缓存。
+    """
+    service = get_gdrive_service()
+    if service is None:
+        return []
+
+    credentials = get_gdrive_credentials()
+    data_files = []
+    errors = []  # 工作线程里的失败先收集，遍历结束后在主线程统一处理
 
-    _recurse(folder_id)
+    def _visit(queries):
+        try:
+            return _list_batch(service, credentials, queries)
+        except Exception as e:
+            return [], [], [], [(path or "root", e) for parents, _ in queries for _, path in parents]
+
+    with ThreadPoolExecutor(max_workers=LIST_WORKERS) as ex:
+        running = {ex.submit(_visit, b) for b in _plan_batches([(folder_id, "")])}
+        while running:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                folders, next_pages, files, errs = future.result()
+                data_files.extend(files)
+                errors.extend(errs)
+                running.update(ex.submit(_visit, b) for b in _plan_batches(folders, next_pages))
+
+    if errors:
+        # 有文件夹没列出来时结果不完整：抛异常让 st.cache_data 不缓存，否则会被持久化到磁盘
+        details = "; ".join(f"{path}: {e}" for path, e in errors[:5])
+        more = f" (+{len(errors) - 5} more)" if len(errors) > 5 else ""
+        raise RuntimeError(f"Failed to list {len(errors)} folder(s) — {details}{more}")
     data_files.sort(key=lambda x: x["path"])
     return data_files
 
@@ -199,10 +363,21 @@ def build_folder_structure(file_list):
         parts = fi["path"].split("/")
         node = root
         for part in parts[:-1]:
-            if part not in node["__subfolders__"]:
-                node["__subfolders__"][part] = {"__subfolders__": {}, "__files__": []}
-            node = node["__subfolders__"][part]
+            node = node["__subfolders__"].setdefault(part, {"__subfolders__": {}, "__files__": []})
         node["__files__"].append(fi)
+
+    # 后序遍历预先算好每个文件夹（含子文件夹）的文件总数和排好序的子项，侧边栏直接读取
+    def _finalize(node):
+        node["__count__"] = len(node["__files__"]) + sum(
+            _finalize(sub) for sub in node["__subfolders__"].values()
+        )
+        node["__sorted_subfolders__"] = sorted(node["__subfolders__"].keys())
+        node["__sorted_files__"] = sorted(node["__files__"], key=lambda x: x["name"])
+        return node["__count__"]
+
+    _finalize(root)
+    # 按类型统计的文件数也随缓存一起算好，侧边栏每次 rerun 不必再遍历全部文件
+    root["__type_counts__"] = Counter(fi["type"] for fi in file_list)
     return root
 
 
@@ -211,42 +386,160 @@ def build_folder_structure(file_list):
 # ============================================================================
 
 
-@st.cache_data(ttl=3600)
-def download_json_from_gdrive(_service, file_id):
-    """下载 JSON 文件并解析"""
-    if _service is None:
+def _get_temp_dir(name="rosbag_cache"):
+    """获取/创建临时目录用于缓存下载的文件"""
+    tmp = os.path.join(tempfile.gettempdir(), name)
+    os.makedirs(tmp, exist_ok=True)
+    return tmp
+
+
+def _write_atomic(path, data):
+    """先写临时文件再 rename，避免其他会话读到写了一半的缓存"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _json_cache_path(file_id, modified_time):
+    stamp = modified_time.replace(":", "-")
+    return os.path.join(_get_temp_dir("json_cache"), f"{file_id}_{stamp}.json")
+
+
+def _trim_json_cache(cache_dir, keep):
+    """缓存目录总大小超过 JSON_CACHE_MAX_BYTES 时，按 mtime 从旧到新删除文件（keep 除外）"""
+    entries = []
+    for path in Path(cache_dir).glob("*.json"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:  # 其他线程 / 会话刚删掉
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= JSON_CACHE_MAX_BYTES:
+            break
+        if str(path) == keep:
+            continue
+        path.unlink(missing_ok=True)
+        total -= size
+
+
+def _fetch_json_bytes(service, file_id, modified_time=None, size=0, http=None):
+    """
+    下载 JSON 原始字节。
+    按 (file_id, modifiedTime) 缓存在本地磁盘，进程重启后文件未修改则不再重新下载。
+    size 取自文件列表，已知且较小时一次请求取回；在工作线程中调用时需传入该线程自己的 http。
+    """
+    cache_path = _json_cache_path(file_id, modified_time) if modified_time else None
+    if cache_path and os.path.isfile(cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                raw = f.read()
+            os.utime(cache_path)  # 命中即刷新 mtime，淘汰时按最近使用排序
+            return raw
+        except FileNotFoundError:  # 刚被淘汰，重新下载
+            pass
+
+    def do_download():
+        req = service.files().get_media(fileId=file_id)
+        if http is not None:
+            req.http = http
+        if 0 < size < SINGLE_SHOT_MAX_SIZE:
+            return req.execute()
+        buf = io.BytesIO()
+        dl = MediaIoBaseDownload(buf, req, chunksize=DOWNLOAD_CHUNK_SIZE)
+        done = False
+        while not done:
+            _, done = dl.next_chunk()
+        return buf.getvalue()
+
+    raw = _execute_with_retry(do_download, f"download json {file_id}")
+    if cache_path:
+        _write_atomic(cache_path, raw)
+        # 同一文件的旧版本不再需要
+        for old in Path(cache_path).parent.glob(f"{file_id}_*.json"):
+            if str(old) != cache_path:
+                old.unlink(missing_ok=True)
+        _trim_json_cache(os.path.dirname(cache_path), keep=cache_path)
+    return raw
+
+
+@st.cache_data(ttl=3600, max_entries=8, show_spinner=False)
+def load_json_arrays(file_id, modified_time=None, size=0):
+    """
+    下载 JSON 并转换为 float32 ndarray 字典。
+    解析出的嵌套 list 只是中间结果，转换后即释放；缓存里只保留紧凑的 ndarray，
+    每次 rerun 反序列化缓存时也不必再重建成千上万个 Python float。
+    """
+    service = get_gdrive_service()
+    if service is None:
         return None
+    # 该文件正在后台预取时先等它写完磁盘缓存，避免前台再并行下载一遍
+    pending = _get_prefetch_pool()[1].get(file_id)
+    if pending is not None:
+        try:
+            pending.result()
+        except Exception:
+            pass  # 预取失败时下面照常在前台下载
     try:
-
-        def do_download():
-            req = _service.files().get_media(fileId=file_id)
-            buf = io.BytesIO()
-            dl = MediaIoBaseDownload(buf, req)
-            done = False
-            while not done:
-                _, done = dl.next_chunk()
-            buf.seek(0)
-            return json.loads(buf.read().decode("utf-8"))
-
-        return _execute_with_retry(do_download, f"download json {file_id}")
+        data = json_loads(_fetch_json_bytes(service, file_id, modified_time, size))
     except Exception as e:
         st.error(f"Error downloading JSON: {e}")
         return None
+    return json_to_arrays(data)
 
 
-def _get_temp_dir():
-    """获取/创建临时目录用于缓存 bag 文件"""
-    tmp = os.path.join(tempfile.gettempdir(), "rosbag_cache")
-    os.makedirs(tmp, exist_ok=True)
-    return tmp
+PREFETCH_WORKERS = 2
+
+
+@st.cache_resource
+def _get_prefetch_pool():
+    """进程级的预取线程池，以及正在预取中的 file_id -> Future"""
+    return ThreadPoolExecutor(max_workers=PREFETCH_WORKERS), {}
 
 
-def download_bag_to_temp(_service, file_id, file_name):
+def _prefetch_json_worker(service, credentials, file_info):
+    _fetch_json_bytes(
+        service,
+        file_info["id"],
+        file_info["modified"],
+        file_info["size"],
+        http=_thread_http(credentials),
+    )
+
+
+def prefetch_json_neighbors(files, selected):
+    """
+    在后台把当前文件前后相邻的 JSON 下载到磁盘缓存，⬅️/➡️ 切换时无需再等 Drive。
+    bag 体积太大，不做预取。
+    """
+    idx = next((i for i, f in enumerate(files) if f["id"] == selected["id"]), None)
+    if idx is None:
+        return
+    pool, inflight = _get_prefetch_pool()
+    service = get_gdrive_service()
+    credentials = get_gdrive_credentials()
+    for j in (idx - 1, idx + 1):
+        if not 0 <= j < len(files):
+            continue
+        fi = files[j]
+        if fi["type"] != "json" or not fi.get("modified") or fi["id"] in inflight:
+            continue
+        if os.path.isfile(_json_cache_path(fi["id"], fi["modified"])):
+            continue
+        future = pool.submit(_prefetch_json_worker, service, credentials, fi)
+        inflight[fi["id"]] = future
+        future.add_done_callback(lambda _, fid=fi["id"]: inflight.pop(fid, None))
+
+
+def download_bag_to_temp(file_id, file_name):
     """
     下载 .bag 文件到临时目录，返回本地路径。
     使用 file_id 作为缓存 key，避免重复下载。
     """
-    if _service is None:
+    service = get_gdrive_service()
+    if service is None:
         return None
 
     tmp_dir = _get_temp_dir()
@@ -255,25 +548,27 @@ def download_bag_to_temp(_service, file_id, file_name):
     if os.path.isfile(local_path):
         return local_path
 
-    try:
-
-        def do_download():
-            req = _service.files().get_media(fileId=file_id)
-            buf = io.BytesIO()
-            dl = MediaIoBaseDownload(buf, req)
-            done = False
-            while not done:
-                status, done = dl.next_chunk()
-            buf.seek(0)
-            with open(local_path, "wb") as f:
-                f.write(buf.read())
-            return local_path
+    def do_download():
+        # 分块直接写入磁盘，不在内存中缓存整个 bag。
+        # 每次下载用独立的临时文件，多个会话同时下载同一 bag 不会互相截断；完成后原子 rename
+        fd, part_path = tempfile.mkstemp(dir=tmp_dir, suffix=".part")
+        try:
+            req = service.files().get_media(fileId=file_id)
+            with os.fdopen(fd, "wb") as f:
+                dl = MediaIoBaseDownload(f, req, chunksize=DOWNLOAD_CHUNK_SIZE)
+                done = False
+                while not done:
+                    status, done = dl.next_chunk()
+            os.replace(part_path, local_path)
+        except BaseException:
+            Path(part_path).unlink(missing_ok=True)
+            raise
+        return local_path
 
+    try:
         return _execute_with_retry(do_download, f"download bag {file_name}")
     except Exception as e:
         st.error(f"Error downloading bag: {e}")
-        if os.path.isfile(local_path):
-            os.remove(local_path)
         return None
 
 
@@ -281,9 +576,110 @@ def download_bag_to_temp(_service, file_id, file_name):
 # ==================  JSON 可视化管线  =====================================
 # ============================================================================
 
+# 时序曲线每条 trace 下发到浏览器的最大点数（服务端 MinMaxLTTB 降采样，JSON / bag 共用）
+RESAMPLE_N_SAMPLES = 2000
+# 触觉时序热力图沿帧轴保留的最大列数
+HEATMAP_MAX_FRAMES = 2000
+
+
+def _new_resampler(figure=None):
+    """
+    创建降采样用的 FigureResampler（JSON / bag 共用）。
+    这里没有 Dash 回调处理 relayout，trace 名上的 [R] 前缀和 ~N 聚合后缀只是噪声，关掉。
+    """
+    return FigureResampler(
+        figure if figure is not None else go.Figure(),
+        default_n_shown_samples=RESAMPLE_N_SAMPLES,
+        resampled_trace_prefix_suffix=("", ""),
+        show_mean_aggregation_size=False,
+    )
+
+
+def _downsample_frames(arr, max_frames=HEATMAP_MAX_FRAMES):
+    """
+    沿帧轴（axis 0）做块均值降采样，使帧数 ≤ max_frames。
+    返回 (降采样后的数组, 每块首帧在原数组中的下标)，下标用于标注真实帧号/时间。
+    """
+    n = arr.shape[0]
+    stride = -(-n // max_frames)
+    if stride <= 1:
+        return arr, np.arange(n)
+    m, tail = divmod(n, stride)
+    reduced = arr[: m * stride].reshape(m, stride, -1).mean(axis=1)
+    if tail:
+        reduced = np.vstack([reduced, arr[m * stride:].mean(axis=0, keepdims=True)])
+    return reduced, np.arange(0, n, stride)
+
+
+def _quantize_u8(arr):
+    """线性量化到 uint8（热力图颜色本身只有 8 bit 分辨率），返回 (q, lo, hi)"""
+    lo, hi = float(arr.min()), float(arr.max())
+    scale = 255.0 / max(hi - lo, 1e-9)
+    q = np.rint((arr - lo) * scale).astype(np.uint8, order="C")
+    return q, lo, hi
+
+
+def _u8_heatmap(arr, x, title="Force"):
+    """用 uint8 量化后的数据构建热力图，colorbar 刻度标回原始单位"""
+    q, lo, hi = _quantize_u8(arr)
+    ticks = np.linspace(0, 255, 5)
+    return go.Heatmap(
+        z=q,
+        x=x,
+        zmin=0,
+        zmax=255,
+        colorscale="Viridis",
+        # z 是量化等级而不是原始力值，hover 中明确标成 level 并给出对应的原始范围
+        hovertemplate="x: %{x}<br>Sensor: %{y}<br>Level: %{z}/255"
+        + f" ({title} {lo:.2f}–{hi:.2f})<extra></extra>",
+        colorbar=dict(
+            title=title,
+            tickvals=ticks,
+            ticktext=[f"{lo + (hi - lo) * t / 255:.2f}" for t in ticks],
+        ),
+    )
+
+
+def _stack_sensor_frames(frames):
+    """
+    把各传感器的当前帧（长度可不同，None 表示无数据）按行放进一块 (n, S_max) float32 数组，
+    不足的位置填 NaN，热力图中显示为空白。
+    """
+    s_max = max((len(f) for f in frames if f is not None), default=0)
+    stacked = np.full((len(frames), s_max), np.nan, dtype=np.float32)
+    for i, f in enumerate(frames):
+        if f is not None:
+            stacked[i, : len(f)] = f
+    return stacked
+
+
+def _frame_stats(frame):
+    """
+    单帧触觉数据的 (min, max, mean, std)。
+    mean/std 由一次求和与一次点积（平方和）得出，std 不再额外遍历求均值和生成临时数组。
+    """
+    a = np.asarray(frame, dtype=np.float64).ravel()
+    n = a.size
+    mean = a.sum() / n
+    var = max(np.dot(a, a) / n - mean * mean, 0.0)
+    return a.min(), a.max(), mean, np.sqrt(var)
+
+
+def json_to_arrays(data):
+    """把 JSON 中的嵌套 list 转换为 float32 ndarray，各 plot 函数直接复用"""
+    arrays = {}
+    for key, value in data.items():
+        if not isinstance(value, list):
+            continue
+        try:
+            arrays[key] = np.asarray(value, dtype=np.float32)
+        except ValueError:
+            continue  # 不规则的嵌套 list，无法转成 ndarray
+    return arrays
+
 
-def json_plot_wrist_pose(data, side, frame_idx=None):
-    poses = np.array(data[f"{side}_wrist_pose"])
+def json_plot_wrist_pose(arrays, side, frame_idx=None):
+    poses = arrays[f"{side}_wrist_pose"]
     if frame_idx is not None:
         pose = poses[frame_idx]
         col1, col2 = st.columns(2)
@@ -298,20 +694,27 @@ def json_plot_wrist_pose(data, side, frame_idx=None):
                 f"[{pose[3]:.3f}, {pose[4]:.3f}, {pose[5]:.3f}, {pose[6]:.3f}]",
             )
     else:
-        fig = make_subplots(
-            rows=2,
-            cols=1,
-            subplot_titles=("Position (x, y, z)", "Orientation (quaternion w, x, y, z)"),
-            vertical_spacing=0.15,
+        fig = _new_resampler(
+            make_subplots(
+                rows=2,
+                cols=1,
+                subplot_titles=("Position (x, y, z)", "Orientation (quaternion w, x, y, z)"),
+                vertical_spacing=0.15,
+            )
         )
+        frames = np.arange(len(poses), dtype=np.int32)
+        # tsdownsample 只接受连续内存的 y，列切片是跨步视图；转置拷贝一次后按行取
+        series = np.ascontiguousarray(poses.T)
         for i, label in enumerate(["x", "y", "z"]):
             fig.add_trace(
-                go.Scatter(x=list(range(len(poses))), y=poses[:, i], name=label, mode="lines"),
+                go.Scattergl(name=label, mode="lines"),
+                hf_x=frames, hf_y=series[i],
                 row=1, col=1,
             )
         for i, label in enumerate(["w", "x", "y", "z"]):
             fig.add_trace(
-                go.Scatter(x=list(range(len(poses))), y=poses[:, i + 3], name=label, mode="lines"),
+                go.Scattergl(name=label, mode="lines"),
+                hf_x=frames, hf_y=series[i + 3],
                 row=2, col=1,
             )
         fig.update_xaxes(title_text="Frame", row=2, col=1)
@@ -321,8 +724,8 @@ def json_plot_wrist_pose(data, side, frame_idx=None):
         st.plotly_chart(fig, use_container_width=True)
 
 
-def json_plot_joint_states(data, side, frame_idx=None):
-    joints = np.array(data[f"{side}_joint_states"])
+def json_plot_joint_states(arrays, side, frame_idx=None):
+    joints = arrays[f"{side}_joint_states"]
     if frame_idx is not None:
         jvals = joints[frame_idx]
         st.write(f"**Frame {frame_idx} — {len(jvals)} joints:**")
@@ -330,27 +733,30 @@ def json_plot_joint_states(data, side, frame_idx=None):
         for i, val in enumerate(jvals):
             cols[i % len(cols)].metric(f"J{i}", f"{val:.3f}")
     else:
-        fig = go.Figure()
+        fig = _new_resampler()
+        frames = np.arange(len(joints), dtype=np.int32)
+        series = np.ascontiguousarray(joints.T)
         for i in range(joints.shape[1]):
-            fig.add_trace(go.Scatter(x=list(range(len(joints))), y=joints[:, i], name=f"Joint {i}", mode="lines"))
+            fig.add_trace(go.Scattergl(name=f"Joint {i}", mode="lines"), hf_x=frames, hf_y=series[i])
         fig.update_layout(
             title=f"{side.capitalize()} Joint States",
             xaxis_title="Frame",
             yaxis_title="Joint Angle (rad)",
+            hovermode="x unified",
             height=500,
         )
         st.plotly_chart(fig, use_container_width=True)
 
 
-def json_plot_tactile_data(data, side, sensor_type, frame_idx=None):
+def json_plot_tactile_data(arrays, side, sensor_type, frame_idx=None):
     sensor_key = f"{side}_{sensor_type}_tactile"
-    tactile = np.array(data[sensor_key])
-    if len(tactile) == 0 or len(tactile[0]) == 0:
+    arr = arrays.get(sensor_key)
+    if arr is None or arr.ndim != 2 or arr.shape[1] == 0:
         st.warning(f"No data for {sensor_key}")
         return
     if frame_idx is not None:
-        frame = np.array(tactile[frame_idx])
-        fig = go.Figure(data=go.Heatmap(z=[frame], colorscale="Viridis", colorbar=dict(title="Force")))
+        frame = arr[frame_idx]
+        fig = go.Figure(data=go.Heatmap(z=frame[np.newaxis, :], colorscale="Viridis", colorbar=dict(title="Force")))
         fig.update_layout(
             title=f"{side.capitalize()} {sensor_type.capitalize()} Tactile — Frame {frame_idx}",
             xaxis_title="Sensor Index",
@@ -358,14 +764,15 @@ def json_plot_tactile_data(data, side, sensor_type, frame_idx=None):
             height=200,
         )
         st.plotly_chart(fig, use_container_width=True)
+        fmin, fmax, fmean, fstd = _frame_stats(frame)
         c1, c2, c3, c4 = st.columns(4)
-        c1.metric("Min", f"{frame.min():.3f}")
-        c2.metric("Max", f"{frame.max():.3f}")
-        c3.metric("Mean", f"{frame.mean():.3f}")
-        c4.metric("Std", f"{frame.std():.3f}")
+        c1.metric("Min", f"{fmin:.3f}")
+        c2.metric("Max", f"{fmax:.3f}")
+        c3.metric("Mean", f"{fmean:.3f}")
+        c4.metric("Std", f"{fstd:.3f}")
     else:
-        arr = np.array(tactile)
-        fig = go.Figure(data=go.Heatmap(z=arr.T, colorscale="Viridis", colorbar=dict(title="Force")))
+        reduced, frame_ids = _downsample_frames(arr)
+        fig = go.Figure(data=_u8_heatmap(reduced.T, frame_ids))
         fig.update_layout(
             title=f"{side.capitalize()} {sensor_type.capitalize()} Tactile Sensor",
             xaxis_title="Frame",
@@ -379,50 +786,48 @@ def json_plot_tactile_data(data, side, sensor_type, frame_idx=None):
         c3.metric("Total", arr.size)
 
 
-def json_plot_all_tactile_comparison(data, side, frame_idx):
+def json_plot_all_tactile_comparison(arrays, side, frame_idx):
     sensors = ["finger_0", "finger_1", "finger_2", "palm"]
-    fig = make_subplots(
-        rows=2,
-        cols=2,
-        subplot_titles=[s.replace("_", " ").title() for s in sensors],
-        vertical_spacing=0.15,
-        horizontal_spacing=0.1,
+    frames = []
+    for sensor in sensors:
+        tactile = arrays.get(f"{side}_{sensor}_tactile")
+        valid = tactile is not None and tactile.ndim == 2 and tactile.shape[1] > 0
+        frames.append(tactile[frame_idx] if valid else None)
+    fig = go.Figure(
+        data=go.Heatmap(
+            z=_stack_sensor_frames(frames),
+            y=[s.replace("_", " ").title() for s in sensors],
+            colorscale="Viridis",
+            connectgaps=False,
+            colorbar=dict(title="Force"),
+        )
     )
-    positions = [(1, 1), (1, 2), (2, 1), (2, 2)]
-    for idx, sensor in enumerate(sensors):
-        key = f"{side}_{sensor}_tactile"
-        tactile = np.array(data[key])
-        if len(tactile) > 0 and len(tactile[0]) > 0:
-            r, c = positions[idx]
-            fig.add_trace(
-                go.Heatmap(z=[np.array(tactile[frame_idx])], colorscale="Viridis", showscale=(idx == 3)),
-                row=r, col=c,
-            )
     fig.update_layout(
         title_text=f"{side.capitalize()} — All Tactile (Frame {frame_idx})",
+        xaxis_title="Sensor Index",
         height=500,
     )
     st.plotly_chart(fig, use_container_width=True)
 
 
-def render_json_visualizer(data, side, viz_mode, frame_idx):
+def render_json_visualizer(arrays, side, viz_mode, frame_idx):
     """JSON 文件的完整可视化 UI"""
     tab1, tab2, tab3, tab4, tab5 = st.tabs(
         ["🎯 Wrist", "🦾 Joints", "👆 Fingers", "🖐️ Palm", "📊 All Tactile"]
     )
     with tab1:
-        json_plot_wrist_pose(data, side, frame_idx)
+        json_plot_wrist_pose(arrays, side, frame_idx)
     with tab2:
-        json_plot_joint_states(data, side, frame_idx)
+        json_plot_joint_states(arrays, side, frame_idx)
     with tab3:
         for finger in ["finger_0", "finger_1", "finger_2"]:
             with st.expander(f"{finger.replace('_', ' ').title()}", expanded=(frame_idx is not None)):
-                json_plot_tactile_data(data, side, finger, frame_idx)
+                json_plot_tactile_data(arrays, side, finger, frame_idx)
     with tab4:
-        json_plot_tactile_data(data, side, "palm", frame_idx)
+        json_plot_tactile_data(arrays, side, "palm", frame_idx)
     with tab5:
         if frame_idx is not None:
-            json_plot_all_tactile_comparison(data, side, frame_idx)
+            json_plot_all_tactile_comparison(arrays, side, frame_idx)
         else:
             st.info("Switch to Single Frame mode to see comparison")
 
@@ -603,6 +1008,21 @@ def bag_load_metadata(bag_path):
     return metadata, dict(topic_timestamps)
 
 
+def _stack_track_poses(track_poses, track_names):
+    """
+    把逐帧的 {部位: pose} 字典堆成 (部位, 7, 帧) 的 float32 数组，缺失的部位填 NaN。
+    帧放在最后一维，每条曲线 arr[部位, 分量] 都是连续内存，可直接交给 tsdownsample。
+    """
+    names = track_names or []
+    arr = np.full((len(track_poses), len(names), 7), np.nan, dtype=np.float32)
+    for i, frame in enumerate(track_poses):
+        for j, name in enumerate(names):
+            pose = frame.get(name)
+            if pose is not None:
+                arr[i, j] = pose
+    return np.ascontiguousarray(arr.transpose(1, 2, 0))
+
+
 @st.cache_data(show_spinner="Loading observation data...")
 def bag_load_observation_data(bag_path):
     from rosbags.rosbag1 import Reader as Rosbag1Reader
@@ -612,7 +1032,7 @@ def bag_load_observation_data(bag_path):
     data = defaultdict(
         lambda: {
             "timestamps": [], "wrist_pose": [], "joint_q": [], "joint_qdot": [],
-            "joint_tau": [], "track_poses": [], "track_names": None,
+            "joint_tau": [], "track_poses": [], "track_timestamps": [], "track_names": None,
             "force_torques": [], "ft_names": None,
         }
     )
@@ -645,6 +1065,7 @@ def bag_load_observation_data(bag_path):
                         p.orientation.x, p.orientation.y, p.orientation.z, p.orientation.w,
                     ]
                 d["track_poses"].append(frame_poses)
+                d["track_timestamps"].append(timestamp / 1e9)
             if len(msg.force_torques) > 0:
                 if d["ft_names"] is None:
                     d["ft_names"] = [ft.header.frame_id for ft in msg.force_torques]
@@ -657,16 +1078,21 @@ def bag_load_observation_data(bag_path):
                     ]
                 d["force_torques"].append(frame_ft)
 
+    # 曲线数据用 float32：plotly 以 base64 typed array 下发 ndarray，体积减半。
+    # timestamps 是 epoch 秒，float32 精度不够，保持 float64。
     result = {}
     for topic, d in data.items():
         result[topic] = {
             "timestamps": np.array(d["timestamps"]),
-            "wrist_pose": np.array(d["wrist_pose"]) if d["wrist_pose"] else np.array([]),
-            "joint_q": np.array(d["joint_q"]) if d["joint_q"] else np.array([]),
-            "joint_qdot": np.array(d["joint_qdot"]) if d["joint_qdot"] else np.array([]),
-            "joint_tau": np.array(d["joint_tau"]) if d["joint_tau"] else np.array([]),
+            "wrist_pose": np.array(d["wrist_pose"], dtype=np.float32) if d["wrist_pose"] else np.array([]),
+            "joint_q": np.array(d["joint_q"], dtype=np.float32) if d["joint_q"] else np.array([]),
+            "joint_qdot": np.array(d["joint_qdot"], dtype=np.float32) if d["joint_qdot"] else np.array([]),
+            "joint_tau": np.array(d["joint_tau"], dtype=np.float32) if d["joint_tau"] else np.array([]),
             "track_names": d["track_names"],
             "track_poses": d["track_poses"],
+            # 只有带 track_poses 的消息才有一行，与 timestamps 长度不一定相同
+            "track_timestamps": np.array(d["track_timestamps"]),
+            "track_array": _stack_track_poses(d["track_poses"], d["track_names"]),
             "ft_names": d["ft_names"],
             "force_torques": d["force_torques"],
         }
@@ -692,7 +1118,7 @@ def bag_load_tactile_data(bag_path):
     result, ts_result = {}, {}
     for topic in all_tactile:
         if topic in tdata and len(tdata[topic]) > 0:
-            result[topic] = np.array(tdata[topic])
+            result[topic] = np.array(tdata[topic], dtype=np.float32)
             ts_result[topic] = np.array(tts[topic])
     return result, ts_result
 
@@ -765,14 +1191,11 @@ def bag_plot_wrist_from_track_poses(obs_data, topic, part_name, frame_idx=None):
     if not track_poses:
         st.warning("No track poses data")
         return
-    poses = []
-    for frame in track_poses:
-        poses.append(frame.get(part_name, [np.nan] * 7))
-    poses = np.array(poses)
-    rel_time = ts - ts[0]
+    poses = d["track_array"][d["track_names"].index(part_name)]  # (7, 帧)
+    rel_time = d["track_timestamps"] - ts[0]
 
     if frame_idx is not None:
-        pose = poses[frame_idx]
+        pose = poses[:, frame_idx]
         col1, col2 = st.columns(2)
         with col1:
             st.markdown(f"**Position** (t={rel_time[frame_idx]:.3f}s)")
@@ -788,21 +1211,25 @@ def bag_plot_wrist_from_track_poses(obs_data, topic, part_name, frame_idx=None):
             c3.metric("qz", f"{pose[5]:.4f}")
             c4.metric("qw", f"{pose[6]:.4f}")
     else:
-        fig = make_subplots(
-            rows=2, cols=1,
-            subplot_titles=("Position (x, y, z)", "Orientation (qx, qy, qz, qw)"),
-            vertical_spacing=0.12,
+        fig = _new_resampler(
+            make_subplots(
+                rows=2, cols=1,
+                subplot_titles=("Position (x, y, z)", "Orientation (qx, qy, qz, qw)"),
+                vertical_spacing=0.12,
+            )
         )
         colors_pos = ["#ff6b6b", "#4ecdc4", "#ffe66d"]
         for i, label in enumerate(["x", "y", "z"]):
             fig.add_trace(
-                go.Scatter(x=rel_time, y=poses[:, i], name=label, mode="lines", line=dict(color=colors_pos[i])),
+                go.Scattergl(name=label, mode="lines", line=dict(color=colors_pos[i])),
+                hf_x=rel_time, hf_y=poses[i],
                 row=1, col=1,
             )
         colors_quat = ["#a29bfe", "#fd79a8", "#00cec9", "#636e72"]
         for i, label in enumerate(["qx", "qy", "qz", "qw"]):
             fig.add_trace(
-                go.Scatter(x=rel_time, y=poses[:, i + 3], name=label, mode="lines", line=dict(color=colors_quat[i])),
+                go.Scattergl(name=label, mode="lines", line=dict(color=colors_quat[i])),
+                hf_x=rel_time, hf_y=poses[i + 3],
                 row=2, col=1,
             )
         fig.update_xaxes(title_text="Time (s)", row=2, col=1)
@@ -828,13 +1255,15 @@ def bag_plot_joint_states(obs_data, topic, field="joint_q", frame_idx=None):
         for i, val in enumerate(jvals):
             cols[i % len(cols)].metric(f"J{i}", f"{val:.4f}")
     else:
-        fig = go.Figure()
+        fig = _new_resampler()
+        series = np.ascontiguousarray(joints.T)
         for i in range(joints.shape[1]):
-            fig.add_trace(go.Scatter(x=rel_time, y=joints[:, i], name=f"J{i}", mode="lines"))
+            fig.add_trace(go.Scattergl(name=f"J{i}", mode="lines"), hf_x=rel_time, hf_y=series[i])
         fig.update_layout(
             title=labels.get(field, field),
             xaxis_title="Time (s)",
             yaxis_title=labels.get(field, field),
+            hovermode="x unified",
             height=450,
             margin=dict(l=40, r=40, t=40, b=40),
         )
@@ -845,11 +1274,12 @@ def bag_plot_track_poses(obs_data, topic, frame_idx=None):
     d = obs_data[topic]
     track_poses = d["track_poses"]
     track_names = d["track_names"]
+    track_array = d["track_array"]
     ts = d["timestamps"]
     if not track_poses or not track_names:
         st.info("No track poses")
         return
-    rel_time = ts - ts[0]
+    rel_time = d["track_timestamps"] - ts[0]
 
     if frame_idx is not None:
         frame = track_poses[frame_idx]
@@ -870,10 +1300,12 @@ def bag_plot_track_poses(obs_data, topic, frame_idx=None):
     else:
         st.markdown("**Position**")
         for comp_idx, comp_label in enumerate(["X", "Y", "Z"]):
-            fig = go.Figure()
-            for name in track_names:
-                vals = [fr.get(name, [np.nan] * 7)[comp_idx] for fr in track_poses]
-                fig.add_trace(go.Scatter(x=rel_time, y=vals, name=name, mode="lines"))
+            fig = _new_resampler()
+            for j, name in enumerate(track_names):
+                fig.add_trace(
+                    go.Scattergl(name=name, mode="lines"),
+                    hf_x=rel_time, hf_y=track_array[j, comp_idx],
+                )
             fig.update_layout(
                 title=f"Position — {comp_label}",
                 xaxis_title="Time (s)",
@@ -886,10 +1318,12 @@ def bag_plot_track_poses(obs_data, topic, frame_idx=None):
         st.markdown("---")
         st.markdown("**Orientation (quaternion)**")
         for comp_idx, comp_label in enumerate(["qx", "qy", "qz", "qw"]):
-            fig = go.Figure()
-            for name in track_names:
-                vals = [fr.get(name, [np.nan] * 7)[comp_idx + 3] for fr in track_poses]
-                fig.add_trace(go.Scatter(x=rel_time, y=vals, name=name, mode="lines"))
+            fig = _new_resampler()
+            for j, name in enumerate(track_names):
+                fig.add_trace(
+                    go.Scattergl(name=name, mode="lines"),
+                    hf_x=rel_time, hf_y=track_array[j, comp_idx + 3],
+                )
             fig.update_layout(
                 title=f"Orientation — {comp_label}",
                 xaxis_title="Time (s)",
@@ -903,7 +1337,7 @@ def bag_plot_track_poses(obs_data, topic, frame_idx=None):
 def bag_plot_tactile_heatmap_single(data_array, timestamps, topic, frame_idx):
     frame = data_array[frame_idx]
     short = topic.split("/")[-2].replace("_tactile", "")
-    fig = go.Figure(data=go.Heatmap(z=[frame], colorscale="Viridis", colorbar=dict(title="Force")))
+    fig = go.Figure(data=go.Heatmap(z=frame[np.newaxis, :], colorscale="Viridis", colorbar=dict(title="Force")))
     fig.update_layout(
         title=f"{short} — Frame {frame_idx}",
         xaxis_title="Sensor Index",
@@ -912,17 +1346,19 @@ def bag_plot_tactile_heatmap_single(data_array, timestamps, topic, frame_idx):
         margin=dict(l=40, r=40, t=40, b=40),
     )
     st.plotly_chart(fig, use_container_width=True)
+    fmin, fmax, fmean, fstd = _frame_stats(frame)
     c1, c2, c3, c4 = st.columns(4)
-    c1.metric("Min", f"{frame.min():.2f}")
-    c2.metric("Max", f"{frame.max():.2f}")
-    c3.metric("Mean", f"{frame.mean():.2f}")
-    c4.metric("Std", f"{frame.std():.2f}")
+    c1.metric("Min", f"{fmin:.2f}")
+    c2.metric("Max", f"{fmax:.2f}")
+    c3.metric("Mean", f"{fmean:.2f}")
+    c4.metric("Std", f"{fstd:.2f}")
 
 
 def bag_plot_tactile_timeseries(data_array, timestamps, topic):
     rel = timestamps - timestamps[0]
     short = topic.split("/")[-2].replace("_tactile", "")
-    fig = go.Figure(data=go.Heatmap(z=data_array.T, x=rel, colorscale="Viridis", colorbar=dict(title="Force")))
+    reduced, frame_ids = _downsample_frames(data_array)
+    fig = go.Figure(data=_u8_heatmap(reduced.T, rel[frame_ids]))
     fig.update_layout(
         title=f"{short}",
         xaxis_title="Time (s)",
@@ -955,32 +1391,24 @@ def bag_plot_tactile_stats(data_array, timestamps, topic):
 def bag_plot_all_tactile_comparison(tactile_data, side, frame_idx):
     sensors = ["finger_0", "finger_1", "finger_2", "palm"]
     topics = TACTILE_TOPICS[side]
-    fig = make_subplots(
-        rows=2, cols=2,
-        subplot_titles=[s.replace("_", " ").title() for s in sensors],
-        vertical_spacing=0.15, horizontal_spacing=0.1,
-    )
-    positions = [(1, 1), (1, 2), (2, 1), (2, 2)]
-    gmax = max(
-        (tactile_data[topics[s]][frame_idx].max() for s in sensors if topics[s] in tactile_data),
-        default=1,
+    frames = [
+        tactile_data[topics[s]][frame_idx] if topics[s] in tactile_data else None
+        for s in sensors
+    ]
+    gmax = max((f.max() for f in frames if f is not None), default=1)
+    fig = go.Figure(
+        data=go.Heatmap(
+            z=_stack_sensor_frames(frames),
+            y=[s.replace("_", " ").title() for s in sensors],
+            colorscale="Viridis",
+            connectgaps=False,
+            zmin=0,
+            zmax=max(gmax, 1),
+        )
     )
-    for idx, sensor in enumerate(sensors):
-        tp = topics[sensor]
-        if tp in tactile_data:
-            r, c = positions[idx]
-            fig.add_trace(
-                go.Heatmap(
-                    z=[tactile_data[tp][frame_idx]],
-                    colorscale="Viridis",
-                    showscale=(idx == 3),
-                    zmin=0,
-                    zmax=max(gmax, 1),
-                ),
-                row=r, col=c,
-            )
     fig.update_layout(
         title_text=f"{side.capitalize()} Tactile (Frame {frame_idx})",
+        xaxis_title="Sensor Index",
         height=450,
         margin=dict(l=40, r=40, t=60, b=40),
     )
@@ -1113,10 +1541,12 @@ def _render_depth_slot(bag_path, topic, label, timestamps, slot_key):
         st.warning("No image data")
 
 
+@st.fragment
 def bag_render_camera_tab(bag_path, camera_topics, img_timestamps):
     """
     动态渲染 Camera Tab。
     根据探测到的 slot 决定列数，自动区分 color/depth，兼容新旧命名。
+    作为 fragment 运行：拖动各相机的帧 slider 只重跑本 Tab。
     """
     if not camera_topics:
         st.warning("⚠️ 当前 bag 中未找到任何已知 camera topic。")
@@ -1184,6 +1614,86 @@ def bag_render_camera_tab(bag_path, camera_topics, img_timestamps):
             break
 
 
+# --- Bag Tab（fragment）---
+# 带有自身控件的 Tab 作为 fragment 运行：切换字段 / 视图 / topic 时只重跑该 Tab，
+# 不再把整页（bag 元数据、其他 Tab 的图）重新执行一遍。
+
+
+@st.fragment
+def bag_render_joints_tab(bag_path, side, frame_idx):
+    st.subheader(f"{side.capitalize()} Joint States")
+    obs_data = bag_load_observation_data(bag_path)
+    ot = OBSERVATION_TOPICS[side]
+    if ot in obs_data:
+        jf = st.selectbox(
+            "Field",
+            ["joint_q", "joint_qdot", "joint_tau"],
+            format_func=lambda x: {
+                "joint_q": "Position (q)",
+                "joint_qdot": "Velocity (qdot)",
+                "joint_tau": "Torque (tau)",
+            }[x],
+        )
+        bag_plot_joint_states(obs_data, ot, field=jf, frame_idx=frame_idx)
+
+
+@st.fragment
+def bag_render_tactile_tab(bag_path, side, frame_idx):
+    st.subheader(f"{side.capitalize()} Tactile")
+    tdata, tts = bag_load_tactile_data(bag_path)
+    tmode = st.radio("View", ["Time Series", "Single Frame", "Statistics"], horizontal=True, key="bag_tac_mode")
+    tf = frame_idx
+    if tmode == "Single Frame" and tf is not None:
+        bag_plot_all_tactile_comparison(tdata, side, tf)
+        st.markdown("---")
+        for sn, tp in TACTILE_TOPICS[side].items():
+            if tp in tdata:
+                with st.expander(f"📍 {sn.replace('_', ' ').title()}", expanded=False):
+                    bag_plot_tactile_heatmap_single(tdata[tp], tts[tp], tp, tf)
+    elif tmode == "Statistics":
+        for sn, tp in TACTILE_TOPICS[side].items():
+            if tp in tdata:
+                with st.expander(f"📍 {sn.replace('_', ' ').title()}", expanded=True):
+                    bag_plot_tactile_stats(tdata[tp], tts[tp], tp)
+    else:
+        for sn, tp in TACTILE_TOPICS[side].items():
+            if tp in tdata:
+                with st.expander(f"📍 {sn.replace('_', ' ').title()}", expanded=True):
+                    bag_plot_tactile_timeseries(tdata[tp], tts[tp], tp)
+
+
+@st.fragment
+def bag_render_human_pose_tab(bag_path, frame_idx):
+    st.subheader("Human Body Pose")
+    obs_data = bag_load_observation_data(bag_path)
+    psrc = st.selectbox(
+        "Source",
+        list(HUMAN_POSE_TOPICS.keys()),
+        format_func=lambda x: x.replace("_", " ").title(),
+    )
+    pt = HUMAN_POSE_TOPICS[psrc]
+    if pt in obs_data:
+        st.markdown("**Track Poses (body parts)**")
+        bag_plot_track_poses(obs_data, pt, frame_idx)
+    else:
+        st.warning("No data")
+
+
+@st.fragment
+def bag_render_quality_tab(topic_timestamps):
+    st.subheader("Data Quality")
+    sel = st.selectbox(
+        "Topic",
+        sorted(topic_timestamps.keys()),
+        format_func=lambda x: f"{x.split('/robot/data/')[-1]} ({len(topic_timestamps[x])})",
+    )
+    if sel:
+        bag_plot_frequency_analysis(topic_timestamps, sel)
+    st.markdown("---")
+    st.subheader("Cross-Topic Sync (120 Hz)")
+    bag_plot_cross_topic_sync(topic_timestamps)
+
+
 # --- Bag 主渲染 ---
 
 
@@ -1253,58 +1763,13 @@ def render_bag_visualizer(bag_path, side, viz_mode, frame_idx):
             st.warning("human_pose_b not available")
 
     with tab2:
-        st.subheader(f"{side.capitalize()} Joint States")
-        obs_data = bag_load_observation_data(bag_path)
-        ot = OBSERVATION_TOPICS[side]
-        if ot in obs_data:
-            jf = st.selectbox(
-                "Field",
-                ["joint_q", "joint_qdot", "joint_tau"],
-                format_func=lambda x: {
-                    "joint_q": "Position (q)",
-                    "joint_qdot": "Velocity (qdot)",
-                    "joint_tau": "Torque (tau)",
-                }[x],
-            )
-            bag_plot_joint_states(obs_data, ot, field=jf, frame_idx=frame_idx)
+        bag_render_joints_tab(bag_path, side, frame_idx)
 
     with tab3:
-        st.subheader(f"{side.capitalize()} Tactile")
-        tdata, tts = bag_load_tactile_data(bag_path)
-        tmode = st.radio("View", ["Time Series", "Single Frame", "Statistics"], horizontal=True, key="bag_tac_mode")
-        tf = frame_idx
-        if tmode == "Single Frame" and tf is not None:
-            bag_plot_all_tactile_comparison(tdata, side, tf)
-            st.markdown("---")
-            for sn, tp in TACTILE_TOPICS[side].items():
-                if tp in tdata:
-                    with st.expander(f"📍 {sn.replace('_', ' ').title()}", expanded=False):
-                        bag_plot_tactile_heatmap_single(tdata[tp], tts[tp], tp, tf)
-        elif tmode == "Statistics":
-            for sn, tp in TACTILE_TOPICS[side].items():
-                if tp in tdata:
-                    with st.expander(f"📍 {sn.replace('_', ' ').title()}", expanded=True):
-                        bag_plot_tactile_stats(tdata[tp], tts[tp], tp)
-        else:
-            for sn, tp in TACTILE_TOPICS[side].items():
-                if tp in tdata:
-                    with st.expander(f"📍 {sn.replace('_', ' ').title()}", expanded=True):
-                        bag_plot_tactile_timeseries(tdata[tp], tts[tp], tp)
+        bag_render_tactile_tab(bag_path, side, frame_idx)
 
     with tab4:
-        st.subheader("Human Body Pose")
-        obs_data = bag_load_observation_data(bag_path)
-        psrc = st.selectbox(
-            "Source",
-            list(HUMAN_POSE_TOPICS.keys()),
-            format_func=lambda x: x.replace("_", " ").title(),
-        )
-        pt = HUMAN_POSE_TOPICS[psrc]
-        if pt in obs_data:
-            st.markdown("**Track Poses (body parts)**")
-            bag_plot_track_poses(obs_data, pt, frame_idx)
-        else:
-            st.warning("No data")
+        bag_render_human_pose_tab(bag_path, frame_idx)
 
     with tab5:
         st.subheader("Camera")
@@ -1312,17 +1777,7 @@ def render_bag_visualizer(bag_path, side, viz_mode, frame_idx):
         bag_render_camera_tab(bag_path, camera_topics, img_timestamps)
 
     with tab6:
-        st.subheader("Data Quality")
-        sel = st.selectbox(
-            "Topic",
-            sorted(topic_timestamps.keys()),
-            format_func=lambda x: f"{x.split('/robot/data/')[-1]} ({len(topic_timestamps[x])})",
-        )
-        if sel:
-            bag_plot_frequency_analysis(topic_timestamps, sel)
-        st.markdown("---")
-        st.subheader("Cross-Topic Sync (120 Hz)")
-        bag_plot_cross_topic_sync(topic_timestamps)
+        bag_render_quality_tab(topic_timestamps)
 
     with tab7:
         st.subheader("All Topics")
@@ -1383,6 +1838,15 @@ def render_bag_visualizer(bag_path, side, viz_mode, frame_idx):
 # ============================================================================
 
 
+def _file_label(fi):
+    type_tag = "🟢" if fi["type"] == "json" else "🔵"
+    label = f"{type_tag} {fi['name']}"
+    size_mb = fi["size"] / 1024 / 1024
+    if size_mb >= 1:
+        label += f" ({size_mb:.0f}MB)"
+    return label
+
+
 def main():
     if not check_password():
         st.stop()
@@ -1412,7 +1876,13 @@ def main():
 
     # --- 加载文件列表 ---
     with st.spinner("Loading file list from Google Drive..."):
-        all_files = list_data_files_from_gdrive(service, folder_id)
+        try:
+            all_files = list_data_files_from_gdrive(folder_id)
+        except Exception as e:
+            st.error(f"❌ File list is incomplete: {e}")
+            if st.button("🔄 Retry", type="primary"):
+                st.rerun()
+            return
 
     if not all_files:
         st.error("No .json or .bag files found in Google Drive folder.")
@@ -1434,14 +1904,18 @@ def main():
     with st.sidebar:
         st.header("📁 File Browser")
 
-        n_json = sum(1 for f in all_files if f["type"] == "json")
-        n_bag = sum(1 for f in all_files if f["type"] == "bag")
+        n_json = structure["__type_counts__"]["json"]
+        n_bag = structure["__type_counts__"]["bag"]
         st.success(f"Total: {len(all_files)} files ({n_json} JSON, {n_bag} BAG)")
 
-        if st.button("🔄 Refresh", use_container_width=True, help="Clear cache and reconnect"):
+        c1, c2 = st.columns(2)
+        if c1.button("🔄 Refresh", use_container_width=True, help="Clear cache and reconnect"):
             st.cache_resource.clear()
             st.cache_data.clear()
             st.rerun()
+        if c2.button("📂 Refresh file list", use_container_width=True, help="Re-scan Google Drive folder"):
+            list_data_files_from_gdrive.clear()
+            st.rerun()
 
         breadcrumb = " / ".join(["Root"] + st.session_state.current_path)
         st.markdown(f"**📂 {breadcrumb}**")
@@ -1463,47 +1937,41 @@ def main():
                 st.rerun()
                 return
 
-        subfolders = sorted(current["__subfolders__"].keys())
+        subfolders = current["__sorted_subfolders__"]
         if subfolders:
             st.subheader(f"📂 Folders ({len(subfolders)})")
             for folder in subfolders:
-
-                def count_files(node):
-                    c = len(node.get("__files__", []))
-                    for sub in node.get("__subfolders__", {}).values():
-                        c += count_files(sub)
-                    return c
-
-                fc = count_files(current["__subfolders__"][folder])
+                fc = current["__subfolders__"][folder]["__count__"]
                 if st.button(f"📁 {folder} ({fc})", key=f"fold_{folder}", use_container_width=True):
                     st.session_state.current_path.append(folder)
                     st.session_state.selected_file = None
                     st.rerun()
 
-        files = sorted(current.get("__files__", []), key=lambda x: x["name"])
+        files = current["__sorted_files__"]
         if files:
             st.markdown("---")
             st.subheader(f"📄 Files ({len(files)})")
-            for fi in files:
-                is_sel = st.session_state.selected_file and st.session_state.selected_file["id"] == fi["id"]
-                btn_type = "primary" if is_sel else "secondary"
-                icon = "✓ " if is_sel else ""
-                size_mb = fi["size"] / 1024 / 1024
-                type_tag = "🟢" if fi["type"] == "json" else "🔵"
-                label = f"{icon}{type_tag} {fi['name']}"
-                if size_mb >= 1:
-                    label += f" ({size_mb:.0f}MB)"
-
-                if st.button(label, key=f"file_{fi['id']}", type=btn_type, use_container_width=True):
-                    st.session_state.selected_file = fi
-                    st.rerun()
+            name_filter = st.text_input("Filter", key="file_filter", placeholder="文件名包含...")
+            name_filter = name_filter.strip().lower()
+            if name_filter:
+                files = [f for f in files if name_filter in f["name"].lower()]
+
+            # 单个 selectbox 代替逐个文件的按钮，文件再多也只有一个 widget
+            sel_id = st.session_state.selected_file["id"] if st.session_state.selected_file else None
+            cidx = next((i for i, f in enumerate(files) if f["id"] == sel_id), None)
+            fidx = st.selectbox(
+                "Select file",
+                range(len(files)),
+                index=cidx,
+                format_func=lambda i: _file_label(files[i]),
+                placeholder="Choose a file..." if files else "No matching files",
+            )
+            if fidx is not None and files[fidx]["id"] != sel_id:
+                st.session_state.selected_file = files[fidx]
+                st.rerun()
 
             if st.session_state.selected_file:
                 st.markdown("---")
-                cidx = next(
-                    (i for i, f in enumerate(files) if f["id"] == st.session_state.selected_file["id"]),
-                    None,
-                )
                 if cidx is not None:
                     c1, c2 = st.columns(2)
                     if c1.button("⬅️", disabled=(cidx == 0), use_container_width=True):
@@ -1514,7 +1982,7 @@ def main():
                         st.rerun()
                     st.caption(f"File {cidx + 1} / {len(files)}")
 
-        if not files and not subfolders:
+        if not current["__sorted_files__"] and not subfolders:
             st.info("Empty folder")
             return
 
@@ -1545,26 +2013,28 @@ def main():
 
         try:
             with st.spinner(f"Loading {selected['name']}..."):
-                data = download_json_from_gdrive(service, selected["id"])
-            if data is None:
+                arrays = load_json_arrays(selected["id"], selected.get("modified"), selected["size"])
+            if arrays is None:
                 st.error("Failed to load file")
                 if st.button("🔄 Retry", type="primary"):
                     st.cache_data.clear()
                     st.rerun()
                 return
 
+            prefetch_json_neighbors(files, selected)
+            num_frames = len(arrays[f"{side}_wrist_pose"])
+
             if viz_mode == "Single Frame":
                 with st.sidebar:
-                    num_frames = len(data[f"{side}_wrist_pose"])
                     frame_idx = st.slider("Frame", 0, num_frames - 1, 0)
 
             with st.expander("📊 Data Summary"):
                 c1, c2, c3 = st.columns(3)
                 c1.metric("File", selected["name"])
-                c2.metric("Frames", len(data[f"{side}_wrist_pose"]))
-                c3.metric("Keys", len(data.keys()))
+                c2.metric("Frames", num_frames)
+                c3.metric("Keys", len(arrays))
 
-            render_json_visualizer(data, side, viz_mode, frame_idx)
+            render_json_visualizer(arrays, side, viz_mode, frame_idx)
 
         except Exception as e:
             st.error(f"Error: {e}")
@@ -1586,7 +2056,7 @@ def main():
 
         try:
             with st.spinner(f"Downloading {selected['name']} ({size_mb:.0f} MB)..."):
-                bag_path = download_bag_to_temp(service, selected["id"], selected["name"])
+                bag_path = download_bag_to_temp(selected["id"], selected["name"])
 
             if bag_path is None:
                 st.error("Failed to download bag file")
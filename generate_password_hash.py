@@ -8,7 +8,10 @@ import hashlib
 import sys
 
 def hash_password(password):
-    """对密码进行 SHA256 哈希"""
+    """
+    对密码进行 SHA256 哈希（十六进制）。
+    必须与 app.py 中 _hash_password 的算法一致，否则已配置的哈希全部失效。
+    """
     return hashlib.sha256(password.encode()).hexdigest()
 
 def main():
@@ -48,7 +51,7 @@ project_id = "..."
 
 gdrive_folder_id = "YOUR_FOLDER_ID"
 
-# 密码保护
+# 密码保护（SHA-256(password) 的十六进制摘要）
 app_password_hash = "{}\"
 """.format(password_hash))
     print()